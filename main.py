@@ -1,85 +1,655 @@
+import asyncio
+import concurrent.futures
+import html
 import os
-import requests
-import schedule
+import pickle
+import random
+import re
+import signal
 import time
-from datetime import datetime, timedelta
-from telegram import Bot
-import trafilatura
-
-# --- Твои данные ---
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_TOKEN")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-bot = Bot(token=TELEGRAM_TOKEN)
-posted_ids = set()  # Чтобы не постить дубли
-
-# --- Функция перевода через Gemini ---
-def translate_text(text):
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={GEMINI_API_KEY}"
-    prompt = f"Переведи следующий текст на русский язык, убрав лишние оценки, баллы и комментарии, сохрани только основной смысл:\n\n{text}"
-    resp = requests.post(url, json={"contents": [{"parts": [{"text": prompt}]}]})
-    if resp.status_code == 200:
+from datetime import datetime
+from hashlib import blake2b
+from operator import itemgetter
+from zoneinfo import ZoneInfo
+
+import aiohttp
+import feedparser
+import orjson
+from lxml import etree
+from pybloom_live import ScalableBloomFilter
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+
+# --- Настройки ---
+class Config:
+    TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+    TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    HN_API_URL = "https://hacker-news.firebaseio.com/v0"
+    HN_SOURCES = [
+        "https://hnrss.org/frontpage",
+        "https://hnrss.org/best",
+    ]
+    TIMEZONE = "Europe/Moscow"
+    POST_HOURS = [9, 12, 18]  # МСК
+    NEWS_LIMIT = 3
+
+
+MSK = ZoneInfo(Config.TIMEZONE)
+
+
+# --- Перевод через Gemini ---
+class GeminiTranslator:
+    CACHE_FILE = "translations.json"
+    MAX_ATTEMPTS = 3
+    BREAKER_THRESHOLD = 3  # подряд проваленных вызовов до размыкания
+    BREAKER_COOLDOWN = 300  # секунд не дёргать Gemini после размыкания
+    MAX_INPUT_CHARS = 24_000  # ~6000 токенов, дальше переводить нечего
+    SYSTEM_PROMPT = (
+        "Ты — профессиональный переводчик технических новостей. Переводи "
+        "присланный текст на русский язык, убирая лишние оценки, баллы и "
+        "комментарии, сохраняя только основной смысл."
+    )
+    # Формат батча; правила перевода живут в SYSTEM_PROMPT
+    BATCH_PROMPT = (
+        "Переведи каждый пункт. Верни пункты строго в том же порядке "
+        "и с той же нумерацией, разделяя их строкой ###:\n\n"
+    )
+    # Типовой мусор, переживший trafilatura
+    _BOILERPLATE = re.compile(
+        r"(?im)^\s*(\d+\s*(?:upvotes?|comments?|points?)|advertisement|subscribe).*$"
+    )
+
+    def __init__(self):
+        # Ленивый импорт: SDK тянет grpc/protobuf и заметно удлиняет
+        # холодный старт, платим только когда переводчик реально нужен
+        import google.generativeai as genai
+
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        # temperature=0: детерминированные ответы, иначе кэш переводов
+        # почти не попадает
+        # Статичная инструкция уезжает в system_instruction и не
+        # повторяется в каждом промпте
+        # flash дешевле и в 2-3 раза быстрее старого gemini-pro на переводе
+        self.model = genai.GenerativeModel(
+            "gemini-1.5-flash-latest",
+            generation_config={"temperature": 0, "max_output_tokens": 1500},
+            system_instruction=self.SYSTEM_PROMPT,
+        )
+        self._fail_count = 0
+        self._open_until = 0.0
+        # Кэш переводов: топ HN сильно пересекается между запусками за день,
+        # попадание в кэш экономит платный вызов Gemini целиком
+        try:
+            with open(self.CACHE_FILE, "rb") as f:
+                self._cache = orjson.loads(f.read())
+        except (OSError, ValueError):
+            self._cache = {}
+
+    async def _generate(self, prompt):
+        """Вызов модели с экспоненциальным бэкоффом и предохранителем.
+
+        Ответ читается стримом и склеивается — первые байты приходят сразу,
+        а не после генерации целиком. После BREAKER_THRESHOLD проваленных
+        серий подряд перестаём ходить в Gemini на BREAKER_COOLDOWN секунд —
+        обречённые повторы не должны тормозить запуск по расписанию.
+        """
+        if time.monotonic() < self._open_until:
+            raise RuntimeError("Gemini отключён после серии ошибок")
+        last_exc = None
+        for attempt in range(self.MAX_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(min(10.0, 2 ** attempt + random.random()))
+            try:
+                resp = await self.model.generate_content_async(prompt, stream=True)
+                text = "".join([chunk.text async for chunk in resp])
+            except Exception as exc:
+                last_exc = exc
+                continue
+            self._fail_count = 0
+            return text
+        self._fail_count += 1
+        if self._fail_count >= self.BREAKER_THRESHOLD:
+            self._open_until = time.monotonic() + self.BREAKER_COOLDOWN
+        raise last_exc
+
+    @staticmethod
+    def _cache_key(text):
+        return blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _trim(self, text):
+        """Чистит и укорачивает текст перед промптом: токены стоят денег,
+        а хвост за лимитом всё равно не попал бы в пост."""
+        text = self._BOILERPLATE.sub("", text)
+        text = re.sub(r"\s+", " ", text).strip()
+        return text[: self.MAX_INPUT_CHARS]
+
+    def _cache_put(self, key, value):
+        self._cache[key] = value
+        try:
+            with open(self.CACHE_FILE, "wb") as f:
+                f.write(orjson.dumps(self._cache))
+        except OSError:
+            pass
+
+    async def translate_to_russian(self, text):
+        text = self._trim(text)
+        key = self._cache_key(text)
+        if key in self._cache:
+            return self._cache[key]
         try:
-            return resp.json()["candidates"][0]["content"]["parts"][0]["text"]
-        except:
+            translated = (await self._generate(text)).strip()
+            self._cache_put(key, translated)
+            return translated
+        except Exception:
             return text
-    else:
+
+    async def translate_batch(self, texts):
+        """Переводит все тексты одним запросом вместо N отдельных вызовов.
+
+        Пункты нумеруются и разделяются строкой ###; если ответ не
+        распарсился по числу пунктов — откатываемся на отдельные вызовы.
+        """
+        if not texts:
+            return []
+        texts = [self._trim(t) for t in texts]
+        keys = [self._cache_key(t) for t in texts]
+        if all(k in self._cache for k in keys):
+            return [self._cache[k] for k in keys]
+        if len(texts) == 1:
+            return [await self.translate_to_russian(texts[0])]
+        numbered = "\n###\n".join(f"{i}) {t}" for i, t in enumerate(texts, 1))
+        batch_key = self._cache_key(numbered)
+        if batch_key in self._cache:
+            return self._cache[batch_key]
+        prompt = self.BATCH_PROMPT + numbered
+        try:
+            answer = await self._generate(prompt)
+            parts = [
+                re.sub(r"^\s*\d+[\).]\s*", "", p).strip()
+                for p in answer.split("###")
+            ]
+            parts = [p for p in parts if p]
+            if len(parts) == len(texts):
+                # Запоминаем и батч целиком, и каждый пункт отдельно —
+                # пункт может всплыть в другом составе батча
+                for src, tr in zip(texts, parts):
+                    self._cache[self._cache_key(src)] = tr
+                self._cache_put(batch_key, parts)
+                return parts
+        except Exception:
+            pass
+        # Не совпало число пунктов или запрос упал — переводим по одному
+        results = await asyncio.gather(
+            *[self.translate_to_russian(t) for t in texts], return_exceptions=True
+        )
+        return [
+            src if isinstance(tr, Exception) else tr
+            for src, tr in zip(texts, results)
+        ]
+
+
+# --- HN API ---
+class HackerNewsAPI:
+    MAX_ATTEMPTS = 3
+    RETRY_STATUSES = {502, 503, 504}
+    ALGOLIA_URL = "https://hn.algolia.com/api/v1/search?tags=front_page&hitsPerPage=10"
+
+    CACHE_TTL = 60  # не дёргаем один и тот же URL чаще раза в минуту
+
+    def __init__(self, session):
+        self.session = session
+        # Не выпускаем в firebase больше 10 запросов разом, чтобы не
+        # упереться в его rate limit
+        self._sem = asyncio.Semaphore(10)
+        self._json_meta = {}  # url -> {'etag', 'data', 'ts'}
+
+    async def _get_json(self, url):
+        # Свежий ответ отдаём из памяти; на протухший шлём условный GET —
+        # 304 означает пустое тело и никакого парсинга
+        meta = self._json_meta.get(url)
+        now = time.monotonic()
+        if meta and now - meta["ts"] < self.CACHE_TTL:
+            return meta["data"]
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        # Пара повторов с бэкоффом на временные ошибки, чтобы один
+        # моргнувший 503 не ронял весь запуск
+        for attempt in range(self.MAX_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(0.3 * 2 ** attempt)
+            try:
+                async with self.session.get(url, headers=headers) as resp:
+                    if resp.status == 304:
+                        meta["ts"] = now
+                        return meta["data"]
+                    if resp.status in self.RETRY_STATUSES:
+                        continue
+                    data = await resp.json(loads=orjson.loads)
+                    if len(self._json_meta) > 256:
+                        self._json_meta.clear()
+                    self._json_meta[url] = {
+                        "etag": resp.headers.get("ETag"),
+                        "data": data,
+                        "ts": now,
+                    }
+                    return data
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                continue
+        return None
+
+    async def get_top_stories_ids(self):
+        return await self._get_json(f"{Config.HN_API_URL}/topstories.json") or []
+
+    async def get_item(self, story_id):
+        async with self._sem:
+            return await self._get_json(f"{Config.HN_API_URL}/item/{story_id}.json")
+
+    async def get_top_stories(self, limit=3, skip=()):
+        # Сначала Algolia: один запрос отдаёт всю первую страницу с URL
+        # и очками, без N+1 походов за каждым элементом
+        data = await self._get_json(self.ALGOLIA_URL)
+        if data and data.get("hits"):
+            stories = [
+                {
+                    "id": hit["objectID"],
+                    "title": hit.get("title") or "Без заголовка",
+                    "url": hit["url"],
+                    "points": hit.get("points") or 0,
+                }
+                for hit in data["hits"]
+                if hit.get("url") and hit["objectID"] not in skip
+            ]
+            if stories:
+                return stories[: limit * 2]
+        # Algolia недоступна — старый путь через firebase
+        ids = await self.get_top_stories_ids()
+        candidates = [i for i in ids if i not in skip][: limit * 2]  # запас, если будут дубли
+        items = await asyncio.gather(
+            *(self.get_item(i) for i in candidates), return_exceptions=True
+        )
+        stories = []
+        for item in items:
+            if isinstance(item, Exception) or not item or "url" not in item:
+                continue
+            stories.append({
+                "id": item["id"],
+                "title": item.get("title", "Без заголовка"),
+                "url": item["url"],
+                "points": item.get("score", 0),
+            })
+        return stories
+
+
+# --- RSS-ленты hnrss.org ---
+class HackerNewsParser:
+    """Один запрос к ленте даёт сразу заголовки, ссылки и очки —
+    без N+1 походов за каждым элементом в firebase."""
+
+    def __init__(self, session):
+        self.session = session
+        self._feed_meta = {}  # url -> {'etag', 'lm', 'news'}
+
+    async def fetch_news(self, url):
+        # Условный GET: hnrss отдаёт ETag, на 304 тело пустое и
+        # парсить нечего — возвращаем прошлый разбор
+        meta = self._feed_meta.get(url, {})
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("lm"):
+            headers["If-Modified-Since"] = meta["lm"]
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return meta.get("news", [])
+            # Сырые байты: и lxml, и feedparser сами разберутся с кодировкой,
+            # без лишнего decode/encode круга на каждую ленту
+            content = await response.read()
+            etag = response.headers.get("ETag")
+            lm = response.headers.get("Last-Modified")
+        news = []
+        for entry in self._parse_items(content):
+            link = entry["link"]
+            if not link:
+                continue
+            m = re.search(r"Points:\s*(\d+)", entry["summary"])
+            news.append({
+                "id": entry["id"] or link,
+                "title": entry["title"],
+                "url": link,
+                "points": int(m.group(1)) if m else 0,
+            })
+        self._feed_meta[url] = {"etag": etag, "lm": lm, "news": news}
+        return news
+
+    @staticmethod
+    def _parse_items(content):
+        """Достаёт <item> ленты через lxml — C-парсер на порядок быстрее
+        чистопитоновского автомата feedparser; тот остаётся запасным."""
+        try:
+            root = etree.fromstring(content)
+            items = [
+                {
+                    "id": it.findtext("guid"),
+                    "title": it.findtext("title") or "Без заголовка",
+                    "link": it.findtext("link"),
+                    "summary": it.findtext("description") or "",
+                }
+                for it in root.findall(".//item")[:10]
+            ]
+            if items:
+                return items
+        except etree.XMLSyntaxError:
+            pass
+        feed = feedparser.parse(content)
+        return [
+            {
+                "id": entry.get("id"),
+                "title": entry.get("title", "Без заголовка"),
+                "link": entry.get("link"),
+                "summary": entry.get("summary", ""),
+            }
+            for entry in feed.entries[:10]
+        ]
+
+    async def get_top_stories(self, limit=3, skip=()):
+        # Все ленты качаются одновременно: ждём самую медленную, а не сумму
+        results = await asyncio.gather(
+            *(self.fetch_news(s) for s in Config.HN_SOURCES),
+            return_exceptions=True,
+        )
+        all_news = [item for r in results if isinstance(r, list) for item in r]
+        # Дедуп одним построением dict (порядок вставки сохраняется),
+        # itemgetter вместо lambda — без кадра Python на каждое сравнение
+        unique_news = list({it["url"]: it for it in all_news}.values())
+        unique_news.sort(key=itemgetter("points"), reverse=True)
+        return [it for it in unique_news if it["id"] not in skip][: limit * 2]
+
+
+# --- Скачиваем и чистим текст статьи ---
+MAX_HTML_BYTES = 500_000  # срезаем хвост гигантских страниц перед разбором
+
+
+def _extract_text(html):
+    # Ленивый импорт (~300 мс): в основном процессе trafilatura не нужна,
+    # разбор идёт в воркерах пула
+    import trafilatura
+
+    # no_fallback: пропускаем медленные readability-эвристики
+    return trafilatura.extract(html, include_comments=False, no_fallback=True)
+
+
+async def get_full_text(session, url, extract_pool=None):
+    # Качаем через общую сессию: не блокируем цикл событий и переиспользуем
+    # keep-alive соединение вместо синхронного trafilatura.fetch_url
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as r:
+            html = await r.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    if not html:
+        return None
+    # Ограничивает худшее время разбора; полезный текст статьи
+    # практически всегда в начале документа
+    html = html[:MAX_HTML_BYTES]
+    if extract_pool is None:
+        return _extract_text(html)
+    # Разбор HTML — чистый CPU (lxml + эвристики, 100-400 мс на статью);
+    # уносим его в отдельный процесс, чтобы цикл событий не стоял
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(extract_pool, _extract_text, html)
+
+
+# --- Отправка в Telegram ---
+class TelegramPoster:
+    MAX_LEN = 4096  # лимит Telegram на длину сообщения
+
+    def __init__(self, session):
+        self.session = session
+        self.api_url = f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}"
+        # Глобальный лимит Telegram — 30 сообщений/с; 25 параллельных
+        # отправок держат нас под ним
+        self._tg_sem = asyncio.Semaphore(25)
+
+    async def send_message(self, text):
+        payload = {
+            "chat_id": Config.TELEGRAM_CHAT_ID,
+            "text": text,
+            "parse_mode": "HTML",
+        }
+        async with self._tg_sem:
+            # orjson + готовый Content-Type: минуем стандартный json-энкодер aiohttp
+            async with self.session.post(
+                f"{self.api_url}/sendMessage",
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
+            ) as resp:
+                return resp.status == 200
+
+    async def send_many(self, texts):
+        return await asyncio.gather(*(self.send_message(t) for t in texts))
+
+    async def send_post(self, text):
+        """Отправляет пост, при необходимости разрезав его по границам
+        блоков под лимит Telegram; части идут по порядку."""
+        if len(text) <= self.MAX_LEN:
+            return await self.send_message(text)
+        parts = []
+        current = ""
+        for block in text.split("\n\n"):
+            if current and len(current) + len(block) + 2 > self.MAX_LEN:
+                parts.append(current)
+                current = block
+            else:
+                current = f"{current}\n\n{block}" if current else block
+        if current:
+            parts.append(current)
+        ok = True
+        for part in parts:
+            ok = await self.send_message(part) and ok
+        return ok
+
+    @staticmethod
+    def format_news_post(news_items, translated):
+        """Собирает дайджест одним join: одна аллокация вместо
+        квадратичного копирования строк при += в цикле."""
+        current_time = datetime.now(MSK).strftime("%d.%m.%Y %H:%M")
+        parts = [f"🔥 <b>Топ технических новостей {current_time} МСК</b>\n\n"]
+        # Экранируем все подставляемые поля: символы <, > и & в заголовках
+        # HN встречаются сплошь и рядом и ломали бы разметку
+        parts.extend(
+            f"<b>{i}. {html.escape(item['title'])}</b>\n"
+            f"{html.escape(tr if len(tr) <= 400 else tr[:400].rsplit(' ', 1)[0] + '…')}\n"
+            f"💬 {item['points']} очков\n"
+            f"🔗 <a href=\"{html.escape(item['url'], quote=True)}\">Читать далее</a>\n\n"
+            for i, (item, tr) in enumerate(zip(news_items, translated), 1)
+        )
+        parts.append("📡 <i>Автоматическая подборка от TechNewsBot</i>")
+        return "".join(parts)
+
+
+# --- Сам бот ---
+class TechNewsBot:
+    SEEN_FILE = "seen.pkl"
+    ARTICLE_TTL = 86_400  # сутки: дольше статья в топе всё равно не живёт
+
+    def __init__(self):
+        # Фильтр Блума вместо растущего set: O(1) проверка, фиксированная
+        # память и переживает рестарты — дубли не постятся заново
+        try:
+            with open(self.SEEN_FILE, "rb") as f:
+                self.seen = pickle.load(f)
+        except (OSError, pickle.PickleError):
+            self.seen = ScalableBloomFilter(initial_capacity=10_000, error_rate=1e-4)
+        self.scheduler = AsyncIOScheduler(timezone=Config.TIMEZONE)
+        self._stop = asyncio.Event()
+        self._extract_pool = concurrent.futures.ProcessPoolExecutor(max_workers=2)
+        self._article_cache = {}  # url -> (monotonic ts, text | None)
+        self._translator = None
+        self.session = None
+        self.parser = None
+        self.hn_api = None
+        self.poster = None
+
+    @property
+    def translator(self):
+        # Ленивая инициализация: импорт SDK и чтение кэша переводов
+        # откладываются до первого обращения, так что сконструировать
+        # бота (например, в тестах) можно без grpc и ключей
+        if self._translator is None:
+            self._translator = GeminiTranslator()
+        return self._translator
+
+    async def __aenter__(self):
+        # Одна сессия на весь процесс: keep-alive избавляет от TCP/TLS
+        # рукопожатий на каждый запрос к HN и Telegram
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=50,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+            ),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+        self.parser = HackerNewsParser(self.session)
+        self.hn_api = HackerNewsAPI(self.session)
+        self.poster = TelegramPoster(self.session)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._extract_pool.shutdown(wait=False)
+        await self.session.close()
+
+    async def process_and_post_news(self):
+        stories = await self.parser.get_top_stories(
+            limit=Config.NEWS_LIMIT, skip=self.seen
+        )
+        if not stories:
+            # Ленты недоступны — откатываемся на firebase API
+            stories = await self.hn_api.get_top_stories(
+                limit=Config.NEWS_LIMIT, skip=self.seen
+            )
+        news_items = await self._collect_news_items(stories)
+        if not news_items:
+            return
+
+        # Один запрос к Gemini на все тексты вместо N отдельных
+        translated = await self.translator.translate_batch(
+            [item["text"] for item in news_items]
+        )
+        post = self.poster.format_news_post(news_items, translated)
+        await self.poster.send_post(post)
+        for item in news_items:
+            self.seen.add(item["id"])
+        self._save_seen()
+
+    async def _collect_news_items(self, stories):
+        """Качает и чистит тексты кандидатов окнами по NEWS_LIMIT+1 и
+        останавливается, как только набралось NEWS_LIMIT удачных.
+
+        Внутри окна скачивание и разбор идут внахлёст, но весь хвост
+        кандидатов не трогаем: обычно хватает первого окна, и лишние
+        страницы не качаются вовсе."""
+        news_items = []
+        window = Config.NEWS_LIMIT + 1
+        for start in range(0, len(stories), window):
+            batch = stories[start:start + window]
+            texts = await asyncio.gather(
+                *(self._get_article_text(s["url"]) for s in batch)
+            )
+            for story, text in zip(batch, texts):
+                if not text:
+                    continue
+                story["text"] = text
+                news_items.append(story)
+                if len(news_items) >= Config.NEWS_LIMIT:
+                    return news_items
+        return news_items
+
+    async def _get_article_text(self, url):
+        """Кэширует результат извлечения на сутки — включая отказы
+        (пустой текст), чтобы соседние запуски не перекачивали и не
+        перепарсивали одни и те же страницы из пересекающегося топа."""
+        cached = self._article_cache.get(url)
+        if cached and time.monotonic() - cached[0] < self.ARTICLE_TTL:
+            return cached[1]
+        text = await get_full_text(self.session, url, self._extract_pool)
+        self._article_cache[url] = (time.monotonic(), text)
         return text
 
-# --- Получаем топ новости ---
-def get_top_news(limit=3):
-    url = "https://hacker-news.firebaseio.com/v0/topstories.json"
-    ids = requests.get(url).json()
-    news_list = []
-    for story_id in ids:
-        if len(news_list) >= limit * 2:  # запас, если будут дубли
-            break
-        if story_id in posted_ids:
-            continue
-        story_url = f"https://hacker-news.firebaseio.com/v0/item/{story_id}.json"
-        story_data = requests.get(story_url).json()
-        if not story_data or "url" not in story_data:
-            continue
-        # Скачиваем и чистим текст
-        html = requests.get(story_data["url"], timeout=10).text
-        text = trafilatura.extract(html)
-        if not text:
-            continue
-        news_list.append({
-            "id": story_id,
-            "title": story_data.get("title", "Без заголовка"),
-            "url": story_data["url"],
-            "text": text
-        })
-    return news_list
-
-# --- Постим новости ---
-def post_top_news():
-    global posted_ids
-    news_items = get_top_news(limit=3)
-    count = 0
-    for item in news_items:
-        if item["id"] in posted_ids:
-            continue
-        translated = translate_text(item["text"])
-        message = f"🔥 **{item['title']}**\n\n{translated}\n\n🔗 Читать: {item['url']}"
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message, parse_mode="Markdown")
-        posted_ids.add(item["id"])
-        count += 1
-        if count >= 3:
-            break
-
-# --- Ставим расписание (МСК) ---
-def schedule_jobs():
-    moscow_offset = 3  # UTC+3
-    for t in ["09:00", "12:00", "18:00"]:
-        schedule.every().day.at(t).do(post_top_news)
+    def _save_seen(self):
+        # Пишем во временный файл и подменяем атомарно: упавший на середине
+        # записи процесс не оставит битый фильтр и не убьёт дедупликацию
+        try:
+            tmp = self.SEEN_FILE + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(self.seen, f)
+            os.replace(tmp, self.SEEN_FILE)
+        except OSError:
+            pass
+
+    # --- Ставим расписание (МСК) ---
+    def setup_scheduler(self):
+        # Один триггер на все времена; coalesce + max_instances=1 не дают
+        # медленному запуску наслоиться на следующий
+        self.scheduler.add_job(
+            self.process_and_post_news,
+            CronTrigger(hour=",".join(map(str, Config.POST_HOURS)), minute=0),
+            id="post_news",
+            coalesce=True,
+            max_instances=1,
+            misfire_grace_time=300,
+        )
+        # Прогрев за минуту до поста: к моменту срабатывания крона ленты и
+        # переводы уже лежат в кэшах, остаётся только отправка
+        self.scheduler.add_job(
+            self._warmup,
+            CronTrigger(
+                hour=",".join(str(h - 1) for h in Config.POST_HOURS), minute=59
+            ),
+            id="warmup",
+            coalesce=True,
+            max_instances=1,
+        )
+
+    async def _warmup(self):
+        try:
+            stories = await self.parser.get_top_stories(
+                limit=Config.NEWS_LIMIT, skip=self.seen
+            )
+            news_items = await self._collect_news_items(stories)
+            if news_items:
+                await self.translator.translate_batch(
+                    [item["text"] for item in news_items]
+                )
+        except Exception:
+            pass  # прогрев не должен ронять процесс
+
+    async def run_forever(self):
+        await self.process_and_post_news()  # постим сразу при старте
+        self.setup_scheduler()
+        self.scheduler.start()
+        # Спим до сигнала вместо пробуждения каждую минуту
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+        await self._stop.wait()
+
 
 # --- Запуск ---
+async def main():
+    async with TechNewsBot() as bot:
+        await bot.run_forever()
+
+
 if __name__ == "__main__":
-    post_top_news()  # Постим сразу при старте
-    schedule_jobs()
-    while True:
-        schedule.run_pending()
-        time.sleep(30)
+    try:
+        # На Railway (Linux) uvloop даёт 2-4x более дешёвый диспетчинг цикла
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    asyncio.run(main())